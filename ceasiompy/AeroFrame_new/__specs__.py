@@ -17,6 +17,10 @@ from pathlib import Path
 # False if the module is disabled (not working or not ready)
 module_status = True
 
+# ===== Main python file =====
+# Name of the python file (without extension) which contains the "main" function
+MAIN_MODULE = "aeroframe_run"
+
 RESULTS_DIR = Path("Results", "AeroFrame_new")
 
 # ===== CPACS inputs and outputs =====
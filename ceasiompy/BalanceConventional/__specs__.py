@@ -5,6 +5,10 @@ from ceasiompy.utils.moduleinterfaces import CPACSInOut
 # False if the module is disabled (not working or not ready)
 module_status = False
 
+# ===== Main python file =====
+# Name of the python file (without extension) which contains the "main" function
+MAIN_MODULE = "balancemain"
+
 # ===== CPACS inputs and outputs =====
 
 cpacs_inout = CPACSInOut()
@@ -36,6 +36,10 @@ from ceasiompy.utils.moduleinterfaces import CPACSInOut
 # False if the module is disabled (not working or not ready)
 module_status = True
 
+# ===== Main python file =====
+# Name of the python file (without extension) which contains the "main" function
+MAIN_MODULE = "cpacs2gmsh"
+
 # ===== Results directory path =====
 
 RESULTS_DIR = Path("Results", "GMSH")
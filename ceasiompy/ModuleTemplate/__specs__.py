@@ -6,6 +6,10 @@ from ceasiompy.utils.commonxpath import CEASIOMPY_XPATH, FUSELAGES_XPATH
 # False if the module is disabled (not working or not ready)
 module_status = False  # Because it is just an example not a real module
 
+# ===== Main python file =====
+# Name of the python file (without extension) which contains the "main" function
+MAIN_MODULE = "moduletemplate"
+
 # ===== CPACS inputs and outputs =====
 
 cpacs_inout = CPACSInOut()
@@ -14,6 +14,10 @@ from pathlib import Path
 # False if the module is disabled (not working or not ready)
 module_status = True  # Because it is just an example not a real module
 
+# ===== Main python file =====
+# Name of the python file (without extension) which contains the "main" function
+MAIN_MODULE = "avlrun"
+
 # ===== Results directory path =====
 
 RESULTS_DIR = Path("Results", "PyAVL")
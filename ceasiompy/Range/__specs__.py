@@ -19,6 +19,10 @@ from ceasiompy.utils.commonxpath import (
 # False if the module is disabled (not working or not ready)
 module_status = False
 
+# ===== Main python file =====
+# Name of the python file (without extension) which contains the "main" function
+MAIN_MODULE = "rangemain"
+
 # ===== Results directory path =====
 
 RESULTS_DIR = Path("Results", "Range")
@@ -7,6 +7,10 @@ from pathlib import Path
 # False if the module is disabled (not working or not ready)
 module_status = True
 
+# ===== Main python file =====
+# Name of the python file (without extension) which contains the "main" function
+MAIN_MODULE = "skinfriction"
+
 # ===== Results directory path =====
 
 RESULTS_DIR = Path("Results", "SkinFriction")
@@ -24,9 +24,11 @@ import os
 import shutil
 import subprocess
 import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterable, List, Optional, Set
 
 from ceasiompy.utils.ceasiomlogger import get_logger
 from ceasiompy.utils.commonxpath import AIRCRAFT_NAME_XPATH
@@ -41,6 +43,25 @@ from cpacspy.cpacsfunctions import (
 
 log = get_logger()
 
+# Ordered (xpath pattern, part type) pairs used to categorize a part, first match wins
+PART_TYPE_RULES = (
+    ("wings/wing", "wing"),
+    ("fuselages/fuselage", "fuselage"),
+    ("enginePylons/enginePylon", "pylon"),
+    ("engine/nacelle/fanCowl", "fanCowl"),
+    ("engine/nacelle/centerCowl", "centerCowl"),
+    ("engine/nacelle/coreCowl", "coreCowl"),
+    ("vehicles/engines/engine", "engine"),
+    ("vehicles/rotorcraft/model/rotors/rotor", "rotor"),
+)
+
+# Number of processors of the host machine and approximately 1/4 of it (see get_reasonable_nb_cpu)
+CPU_COUNT = os.cpu_count() or 1
+REASONABLE_CPU_COUNT = max(1, math.ceil(CPU_COUNT / 4))
+
+# Main function of the modules already imported by 'run_module', stored by module name
+_MAIN_CACHE: Dict[str, Callable] = {}
+
 # =================================================================================================
 #   CLASSES
 # =================================================================================================
@@ -82,21 +103,33 @@ def get_aeromap_list_from_xpath(cpacs, aeromap_to_analyze_xpath, empty_if_not_fo
     """
 
     aeromap_uid_list = []
-    try:
-        aeromap_uid_list = get_string_vector(cpacs.tixi, aeromap_to_analyze_xpath)
-    except ValueError:  # if aeroMapToPlot is not define, select all aeromaps
-        if not empty_if_not_found:
-            aeromap_uid_list = cpacs.get_aeromap_uid_list()
-            create_branch(cpacs.tixi, aeromap_to_analyze_xpath)
-            add_string_vector(cpacs.tixi, aeromap_to_analyze_xpath, aeromap_uid_list)
+    if cpacs.tixi.checkElement(aeromap_to_analyze_xpath):
+        try:
+            aeromap_uid_list = get_string_vector(cpacs.tixi, aeromap_to_analyze_xpath)
+        except ValueError:  # the element exists but is empty
+            pass
+
+    # if aeroMapToPlot is not define, select all aeromaps
+    if not aeromap_uid_list and not empty_if_not_found:
+        aeromap_uid_list = cpacs.get_aeromap_uid_list()
+        create_branch(cpacs.tixi, aeromap_to_analyze_xpath)
+        add_string_vector(cpacs.tixi, aeromap_to_analyze_xpath, aeromap_uid_list)
 
     return aeromap_uid_list
 
 
+@lru_cache(maxsize=1)
+def _module_set() -> frozenset:
+    """Return the set of all CEASIOMpy module names. The module directory is scanned only once,
+    use '_module_set.cache_clear()' to force a new scan."""
+
+    return frozenset(get_module_list(only_active=False))
+
+
 def get_results_directory(module_name: str) -> Path:
     """Create (if not exists) and return the results directory for a module"""
 
-    if module_name not in get_module_list(only_active=False):
+    if module_name not in _module_set():
         raise ValueError(f"Module '{module_name}' did not exit!")
 
     specs = importlib.import_module(f"ceasiompy.{module_name}.__specs__")
@@ -128,16 +161,119 @@ def run_module(module, wkdir=Path.cwd(), iteration=0):
         log.info("Optimisation module is only run at first iteration!")
 
     else:
-        for file in module.module_dir.iterdir():
-            if file.name.endswith(".py") and not file.name.startswith("__"):
-                python_file = file.stem
+        main_fn = _MAIN_CACHE.get(module.name)
+
+        if main_fn is None:
+            specs = importlib.import_module(f"ceasiompy.{module.name}.__specs__")
+            python_file = getattr(specs, "MAIN_MODULE", None)
+
+            if python_file is None:
+                log.warning(
+                    f"MAIN_MODULE is not defined in the __specs__.py file of {module.name}, "
+                    "the module directory will be scanned to find its main python file. "
+                    "This is deprecated, please define MAIN_MODULE."
+                )
+                with os.scandir(module.module_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".py") and not entry.name.startswith("__"):
+                            python_file = entry.name[:-3]
+                            break
+
+            # Import the main function from the module
+            my_module = importlib.import_module(f"ceasiompy.{module.name}.{python_file}")
+            main_fn = _MAIN_CACHE[module.name] = my_module.main
+
+        # Run the module, modules use the current working directory to write their results (see
+        # 'get_results_directory'), so it must still be changed for them
+        with change_working_dir(wkdir):
+            main_fn(module.cpacs_in, module.cpacs_out)
 
-        # Import the main function from the module
-        my_module = importlib.import_module(f"ceasiompy.{module.name}.{python_file}")
 
-        # Run the module
-        with change_working_dir(wkdir):
-            my_module.main(module.cpacs_in, module.cpacs_out)
+def run_modules(
+    modules,
+    dependencies: Dict[str, Set[str]] = None,
+    wkdir=Path.cwd(),
+    max_workers: int = None,
+    heavy_modules: Iterable[str] = (),
+    heavy_workers: int = 1,
+    worker: Callable = None,
+) -> None:
+    """Run a list of 'ModuleToRun' objects in a specific wkdir. Modules are started as soon as
+    all the modules they depend on are done, so modules which do not depend on each other are
+    run in parallel (each one in its own process).
+
+    Args:
+        modules (List[ModuleToRun]): 'ModuleToRun' objects to run, names must be unique.
+        dependencies (Dict[str, Set[str]], optional): Names of the modules each module depends
+            on. Modules not in this dict do not depend on any other. Defaults to None.
+        wkdir (Path, optional): Path of the working directory, only used for the modules which
+            have no 'module_wkflow_path' (see 'create_module_wkflow_dir'). Modules sharing the
+            same wkdir must not write in the same results directory. Defaults to Path.cwd().
+        max_workers (int, optional): Number of modules run at the same time. Defaults to
+            get_reasonable_nb_cpu().
+        heavy_modules (Iterable[str], optional): Names of the modules which are run in a
+            separate pool (e.g. CFD solvers already using several cpus). Defaults to ().
+        heavy_workers (int, optional): Number of heavy modules run at the same time. Defaults
+            to 1.
+        worker (Callable, optional): Function called as 'worker(module, wkdir)' to run each
+            module, it must be picklable (defined at module level). Defaults to run_module.
+
+    """
+
+    if max_workers is None:
+        max_workers = get_reasonable_nb_cpu()
+
+    if worker is None:
+        worker = run_module
+
+    if dependencies is None:
+        dependencies = {}
+
+    modules_by_name = {module.name: module for module in modules}
+    if len(modules_by_name) != len(modules):
+        raise ValueError("Module names must be unique to be run with 'run_modules'!")
+
+    unknown_modules = set(dependencies).union(*dependencies.values()) - set(modules_by_name)
+    if unknown_modules:
+        unknown_str = ", ".join(sorted(unknown_modules))
+        raise ValueError(f"Unknown module(s) in dependencies: {unknown_str}")
+
+    heavy_modules = set(heavy_modules)
+    remaining = {name: set(dependencies.get(name, ())) for name in modules_by_name}
+    running = {}
+
+    with ProcessPoolExecutor(max_workers) as cpu_pool:
+        with ProcessPoolExecutor(heavy_workers) as heavy_pool:
+            while remaining or running:
+
+                for name in [name for name, deps in remaining.items() if not deps]:
+                    del remaining[name]
+                    pool = heavy_pool if name in heavy_modules else cpu_pool
+                    module = modules_by_name[name]
+                    module_wkdir = getattr(module, "module_wkflow_path", wkdir)
+                    running[pool.submit(worker, module, module_wkdir)] = name
+
+                if not running:
+                    raise ValueError(
+                        f"Circular dependencies between module(s): {', '.join(remaining)}"
+                    )
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name = running.pop(future)
+                    future.result()  # Raise the exception of the module if it failed
+
+                    for deps in remaining.values():
+                        deps.discard(name)
+
+
+@lru_cache(maxsize=None)
+def _which_cached(software_name: str) -> Optional[str]:
+    """Return the result of 'shutil.which' for a software. The PATH is only searched once per
+    software, use '_which_cached.cache_clear()' to force a new search."""
+
+    return shutil.which(software_name)
 
 
 def get_install_path(software_name: str, raise_error: bool = False) -> Path:
@@ -149,7 +285,7 @@ def get_install_path(software_name: str, raise_error: bool = False) -> Path:
 
     """
 
-    install_path = shutil.which(software_name)
+    install_path = _which_cached(software_name)
 
     if install_path is not None:
         log.info(f"{software_name} is installed at: {install_path}")
@@ -179,7 +315,7 @@ def run_software(
 
     """
 
-    log.info(f"{int(nb_cpu)} cpu over {os.cpu_count()} will be used for this calculation.")
+    log.info(f"{int(nb_cpu)} cpu over {CPU_COUNT} will be used for this calculation.")
 
     logfile = Path(wkdir, f"logfile_{software_name}.log")
     install_path = get_install_path(software_name)
@@ -203,9 +339,19 @@ def run_software(
     log.info("Command line that will be run is:")
     log.info(" ".join(map(str, command_line)))
 
-    with change_working_dir(wkdir):
-        with open(logfile, "w") as logfile:
-            subprocess.call(command_line, stdout=logfile)
+    # Stream the output line by line so the logfile can be followed during the run. The output is
+    # kept as bytes, a software could write characters which are not valid in the locale encoding
+    with open(logfile, "wb") as logfile:
+        with subprocess.Popen(
+            command_line,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=str(wkdir),
+        ) as proc:
+            for line in iter(proc.stdout.readline, b""):
+                logfile.write(line)
+                logfile.flush()
+            proc.wait()
 
     log.info(f">>> {software_name} End")
 
@@ -216,12 +362,15 @@ def get_reasonable_nb_cpu() -> int:
     This function is generally used to set up a default value for the number of processors,
     the user can then override this value with the settings."""
 
-    cpu_count = os.cpu_count()
+    return REASONABLE_CPU_COUNT
+
 
-    if cpu_count is None:
-        return 1
+@lru_cache(maxsize=8)
+def _get_aircraft_name_from_file(cpacs_path: str, mtime_ns: int) -> str:
+    """Get the aircraft name from a CPACS file. The file is only parsed once as long as it is not
+    modified ('mtime_ns' is part of the cache key)."""
 
-    return math.ceil(cpu_count / 4)
+    return get_value_or_default(open_tixi(Path(cpacs_path)), AIRCRAFT_NAME_XPATH, "Aircraft")
 
 
 def aircraft_name(tixi_or_cpacs):
@@ -240,11 +389,10 @@ def aircraft_name(tixi_or_cpacs):
     # *modify corresponding test
 
     if isinstance(tixi_or_cpacs, Path):
-        tixi = open_tixi(tixi_or_cpacs)
+        mtime_ns = tixi_or_cpacs.stat().st_mtime_ns
+        name = _get_aircraft_name_from_file(str(tixi_or_cpacs), mtime_ns)
     else:
-        tixi = tixi_or_cpacs
-
-    name = get_value_or_default(tixi, AIRCRAFT_NAME_XPATH, "Aircraft")
+        name = get_value_or_default(tixi_or_cpacs, AIRCRAFT_NAME_XPATH, "Aircraft")
 
     name = name.replace(" ", "_")
     log.info(f"The name of the aircraft is : {name}")
@@ -252,6 +400,34 @@ def aircraft_name(tixi_or_cpacs):
     return name
 
 
+def get_uid_xpath(tixi, uid: str) -> str:
+    """Return the xpath of the element with the given uID. Resolved xpaths are stored on the tixi
+    handle, so parts looked up several times (e.g. when meshing) are only resolved once.
+
+    Warning: the stored xpaths are never invalidated. If elements are removed or inserted with
+    the same tixi handle, an indexed xpath (e.g. '.../wing[2]') may point to another element.
+    Only use this function on a tixi handle whose structure is not modified.
+
+    Args:
+        tixi (Tixi3 object): Tixi handle of the CPACS file
+        uid (str): uID of the element
+
+    Returns:
+        xpath (str): Xpath of the element.
+
+    """
+
+    uid_index = getattr(tixi, "_uid_xpath_index", None)
+    if uid_index is None:
+        uid_index = {}
+        tixi._uid_xpath_index = uid_index
+
+    if uid not in uid_index:
+        uid_index[uid] = tixi.uIDGetXPath(uid)
+
+    return uid_index[uid]
+
+
 def get_part_type(tixi, part_uid: str, print=True) -> str:
     """The function get the type of the aircraft from the cpacs file.
 
@@ -266,47 +442,14 @@ def get_part_type(tixi, part_uid: str, print=True) -> str:
 
     # split uid if mirrored part
     part_uid = part_uid.split("_mirrored")[0]
-    part_xpath = tixi.uIDGetXPath(part_uid)
-
-    if "wings/wing" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is a wing")
-        return "wing"
-
-    elif "fuselages/fuselage" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is a fuselage")
-        return "fuselage"
-
-    elif "enginePylons/enginePylon" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is a pylon")
-        return "pylon"
-
-    elif "engine/nacelle/fanCowl" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is a fanCowl")
-        return "fanCowl"
-
-    elif "engine/nacelle/centerCowl" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is a centerCowl")
-        return "centerCowl"
-
-    elif "engine/nacelle/coreCowl" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is a coreCowl")
-        return "coreCowl"
-
-    elif "vehicles/engines/engine" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is an engine")
-        return "engine"
-
-    elif "vehicles/rotorcraft/model/rotors/rotor" in part_xpath:
-        if print:
-            log.info(f"'{part_uid}' is an rotor")
-        return "rotor"
+    part_xpath = get_uid_xpath(tixi, part_uid)
+
+    for xpath_pattern, part_type in PART_TYPE_RULES:
+        if xpath_pattern in part_xpath:
+            if print:
+                article = "an" if part_type[0] in "aeiou" else "a"
+                log.info(f"'{part_uid}' is {article} {part_type}")
+            return part_type
 
     if print:
         log.warning(f"'{part_uid}' cannot be categorized!")
@@ -322,14 +465,16 @@ def remove_file_type_in_dir(directory: Path, file_type_list: List[str]) -> None:
 
     """
 
-    if not directory.exists():
+    if not os.path.isdir(directory):
         raise FileNotFoundError(f"The directory {directory} does not exist!")
 
-    for file in directory.iterdir():
-        if not file.is_file():
-            continue
-        if file.suffix in file_type_list:
-            file.unlink()
+    file_types = set(file_type_list)
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                if os.path.splitext(entry.name)[1] in file_types:
+                    os.unlink(entry.path)
 
 
 # =================================================================================================
@@ -18,6 +18,7 @@ Python version: >=3.8
 
 import os
 import shutil
+import time
 from pathlib import Path
 import pytest
 from ceasiompy.utils.ceasiompyutils import (
@@ -28,16 +29,21 @@ from ceasiompy.utils.ceasiompyutils import (
     get_install_path,
     get_part_type,
     get_results_directory,
+    get_uid_xpath,
     remove_file_type_in_dir,
+    run_modules,
     run_software,
 )
-from ceasiompy.utils.commonpaths import CPACS_FILES_PATH
+from ceasiompy.utils.commonpaths import CPACS_FILES_PATH, MODULES_DIR_PATH
+from ceasiompy.utils.moduleinterfaces import get_module_list, get_specs_for_module
+from ceasiompy.utils.workflowclasses import ModuleToRun
 from cpacspy.cpacsfunctions import open_tixi
 from cpacspy.cpacspy import CPACS
 
 MODULE_DIR = Path(__file__).parent
 TMP_DIR = Path(MODULE_DIR, "tmp")
 LOGFILE = Path(TMP_DIR, "logfile_python.log")
+RUN_MODULES_LOG = Path(TMP_DIR, "run_modules.log")
 
 # =================================================================================================
 #   CLASSES
@@ -49,6 +55,24 @@ LOGFILE = Path(TMP_DIR, "logfile_python.log")
 # =================================================================================================
 
 
+def record_module(module, wkdir):
+    """Worker for 'run_modules' which records the start and end of each module run."""
+
+    with open(RUN_MODULES_LOG, "a") as f:
+        f.write(f"start {module.name} {os.getpid()} {wkdir}\n")
+
+    time.sleep(0.2)
+
+    with open(RUN_MODULES_LOG, "a") as f:
+        f.write(f"end {module.name} {os.getpid()} {wkdir}\n")
+
+
+def failing_module(module, wkdir):
+    """Worker for 'run_modules' which always fails."""
+
+    raise RuntimeError(f"{module.name} failed!")
+
+
 def test_change_working_dir():
     """Test the function (context manager) change_working_dir."""
 
@@ -105,6 +129,82 @@ def test_run_module():
     # TODO: how to test this function?
 
 
+def test_main_module_in_specs():
+    """Test that the MAIN_MODULE defined in each __specs__.py file (used by run_module) exists."""
+
+    for module_name in get_module_list(only_active=False):
+        if module_name == "utils":
+            continue
+
+        specs = get_specs_for_module(module_name)
+        assert Path(MODULES_DIR_PATH, module_name, f"{specs.MAIN_MODULE}.py").exists()
+
+
+def test_run_modules():
+    """Test the function run_modules."""
+
+    modules = [ModuleToRun("ExportCSV", TMP_DIR), ModuleToRun("CPACS2SUMO", TMP_DIR)]
+
+    with pytest.raises(ValueError):
+        run_modules(modules, {"ExportCSV": {"NotExistingModule"}}, TMP_DIR)
+
+    with pytest.raises(ValueError):
+        run_modules(modules, {"ExportCSV": {"CPACS2SUMO"}, "CPACS2SUMO": {"ExportCSV"}}, TMP_DIR)
+
+    # A failure in a module must reach the caller
+    with pytest.raises(RuntimeError):
+        run_modules(modules, wkdir=TMP_DIR, worker=failing_module)
+
+    # ExportCSV -> (CPACS2SUMO, SkinFriction) -> ThermoData
+    module_names = ["ExportCSV", "CPACS2SUMO", "SkinFriction", "ThermoData"]
+    modules = [ModuleToRun(name, TMP_DIR) for name in module_names]
+    modules[3].module_wkflow_path = MODULE_DIR
+    dependencies = {
+        "CPACS2SUMO": {"ExportCSV"},
+        "SkinFriction": {"ExportCSV"},
+        "ThermoData": {"CPACS2SUMO", "SkinFriction"},
+    }
+
+    if RUN_MODULES_LOG.exists():
+        RUN_MODULES_LOG.unlink()
+
+    run_modules(
+        modules,
+        dependencies,
+        TMP_DIR,
+        max_workers=2,
+        heavy_modules=["CPACS2SUMO", "SkinFriction"],
+        worker=record_module,
+    )
+
+    with open(RUN_MODULES_LOG, "r") as f:
+        events = [line.split(maxsplit=3) for line in f.read().splitlines()]
+    RUN_MODULES_LOG.unlink()
+
+    # All modules have been run once
+    starts = {name: i for i, (event, name, _, _) in enumerate(events) if event == "start"}
+    ends = {name: i for i, (event, name, _, _) in enumerate(events) if event == "end"}
+    assert set(starts) == set(ends) == set(module_names)
+    assert len(events) == 2 * len(module_names)
+
+    # A module only starts when all its dependencies are done
+    for name, deps in dependencies.items():
+        for dep in deps:
+            assert ends[dep] < starts[name]
+
+    # Heavy modules are run in the heavy pool (a single process, so one after the other)
+    pids = {name: pid for _, name, pid, _ in events}
+    assert pids["CPACS2SUMO"] == pids["SkinFriction"]
+    assert pids["CPACS2SUMO"] not in (pids["ExportCSV"], pids["ThermoData"])
+    heavy_1, heavy_2 = sorted(["CPACS2SUMO", "SkinFriction"], key=starts.get)
+    assert ends[heavy_1] < starts[heavy_2]
+
+    # Modules are run in their own workflow directory when it is defined
+    wkdirs = {name: wkdir for _, name, _, wkdir in events}
+    assert wkdirs["ThermoData"] == str(MODULE_DIR)
+    assert wkdirs["ExportCSV"] == str(TMP_DIR)
+
+
 def test_get_install_path():
     """Test the function 'get_install_path'."""
 
@@ -126,6 +226,12 @@ def test_run_software():
     with open(LOGFILE, "r") as f:
         assert "Hello World!" in f.readlines()[0]
 
+    # Output which is not valid UTF-8 must be written as it is in the logfile
+    run_software("python", ["-c", "import sys; sys.stdout.buffer.write(b'\\xff\\n')"], TMP_DIR)
+
+    with open(LOGFILE, "rb") as f:
+        assert f.read() == b"\xff\n"
+
 
 def test_aircraft_name():
     """Test the function aircraft_name."""
@@ -156,6 +262,27 @@ def test_get_part_type():
     assert get_part_type(tixi, "Pylon_mirrored") == "pylon"
 
 
+def test_get_uid_xpath(monkeypatch):
+    """Test the function get_uid_xpath"""
+
+    cpacs_in = Path(CPACS_FILES_PATH, "simple_engine.xml")
+    tixi = open_tixi(cpacs_in)
+    wing_xpath = tixi.uIDGetXPath("Wing")
+
+    uid_get_xpath = tixi.uIDGetXPath
+    calls = []
+
+    def counted_uid_get_xpath(uid):
+        calls.append(uid)
+        return uid_get_xpath(uid)
+
+    monkeypatch.setattr(tixi, "uIDGetXPath", counted_uid_get_xpath)
+
+    assert get_uid_xpath(tixi, "Wing") == wing_xpath
+    assert get_uid_xpath(tixi, "Wing") == wing_xpath
+    assert calls == ["Wing"]
+
+
 def test_remove_file_type_in_dir():
     """Test the function 'remove_file_type_in_dir'"""
 
@@ -30,7 +30,7 @@ from cpacspy.cpacsfunctions import (
     get_string_vector,
     get_value_or_default,
 )
-from cpacspy.cpacspy import CPACS
+from cpacspy.utils import PARAMS
 from streamlitutils import create_sidebar
 from ceasiompy.utils.commonxpath import SU2MESH_XPATH
 
@@ -44,6 +44,8 @@ how_to_text = (
     "1. Go to the *Run Workflow* page\n"
 )
 
+MESH_WRITE_CHUNK_SIZE = 4 * 1024 * 1024  # 4 MiB
+
 create_sidebar(how_to_text)
 
 # Custom CSS
@@ -75,9 +77,45 @@ def update_value(xpath, key):
         add_value(st.session_state.cpacs.tixi, xpath, value)
 
 
+def reset_cpacs_cache():
+    """Reset the cache of CPACS values if the tixi handle has changed since the last rerun."""
+
+    tixi = st.session_state.cpacs.tixi
+    if st.session_state.get("cached_tixi") is not tixi:
+        st.session_state.cached_tixi = tixi
+        st.session_state.xpath_values = {}
+
+
+def get_cached_value_or_default(xpath, default_value):
+    """Return the value at xpath (or the default value) and keep it in the session state, so the
+    CPACS file is only read once per xpath instead of at every rerun of the page."""
+
+    xpath_values = st.session_state.xpath_values
+    if xpath not in xpath_values:
+        xpath_values[xpath] = get_value_or_default(
+            st.session_state.cpacs.tixi, xpath, default_value
+        )
+
+    return xpath_values[xpath]
+
+
 def update_all_modified_value():
-    for xpath, key in st.session_state.xpath_to_update.items():
+    reset_cpacs_cache()
+    xpath_values = st.session_state.xpath_values
+
+    # Settings with the same value as in the CPACS file are skipped, the remaining are sorted by
+    # xpath to keep writes to sibling nodes together
+    pending = sorted(
+        (xpath, key)
+        for xpath, key in st.session_state.xpath_to_update.items()
+        if key in st.session_state
+        and (xpath not in xpath_values or st.session_state[key] != xpath_values[xpath])
+    )
+
+    for xpath, key in pending:
         update_value(xpath, key)
+        value = st.session_state[key]
+        xpath_values[xpath] = list(value) if isinstance(value, list) else value
 
 
 def save_cpacs_file():
@@ -85,7 +123,9 @@ def save_cpacs_file():
     saved_cpacs_file = Path(st.session_state.workflow.working_dir, "CPACS_selected_from_GUI.xml")
     st.session_state.cpacs.save_cpacs(saved_cpacs_file, overwrite=True)
     st.session_state.workflow.cpacs_in = saved_cpacs_file
-    st.session_state.cpacs = CPACS(saved_cpacs_file)
+
+    # The tixi handle already contains what has been saved, no need to parse the file again
+    st.session_state.cpacs.cpacs_file = str(saved_cpacs_file)
 
 
 # def upload_and_save_file(file_uploader, save_dir):
@@ -111,7 +151,48 @@ def save_cpacs_file():
 #     return None
 
 
+def delete_aeromap(aeromap_uid):
+    st.session_state.cpacs.delete_aeromap(aeromap_uid)
+
+
+def create_new_aeromap():
+    new_aeromap_uid = st.session_state.new_aeromap_uid
+
+    if new_aeromap_uid in st.session_state.cpacs.get_aeromap_uid_list():
+        st.session_state.new_aeromap_exist = True
+        return
+
+    new_aeromap = st.session_state.cpacs.create_aeromap(new_aeromap_uid)
+    new_aeromap.description = st.session_state.new_aeromap_description
+    new_aeromap.add_row(
+        mach=st.session_state.point_mach,
+        alt=st.session_state.point_alt,
+        aos=st.session_state.point_aos,
+        aoa=st.session_state.point_aoa,
+    )
+    new_aeromap.save()
+
+
+def add_uploaded_aeromap(uploaded_csv):
+    uploaded_aeromap_uid = uploaded_csv.name.split(".csv")[0]
+
+    if uploaded_aeromap_uid in st.session_state.cpacs.get_aeromap_uid_list():
+        st.session_state.uploaded_aeromap_exist = True
+        return
+
+    new_aeromap = st.session_state.cpacs.create_aeromap(uploaded_aeromap_uid)
+    new_aeromap.df = pd.read_csv(
+        uploaded_csv,
+        keep_default_na=False,
+        engine="c",
+        dtype={param: "float64" for param in PARAMS},
+    )
+    new_aeromap.save()
+
+
 def section_edit_aeromap():
+    # Aeromaps are added/deleted in button callbacks, which are run before the page, so the
+    # changes are already visible without having to rerun the page a second time
     st.markdown("#### Available aeromaps")
 
     aeromap_uid_list = st.session_state.cpacs.get_aeromap_uid_list()
@@ -130,9 +211,13 @@ def section_edit_aeromap():
                     st.download_button("Download", f, file_name=csv_file_name)
 
         with col3:
-            if st.button("❌", key=f"del{i}", help="Delete this aeromap"):
-                st.session_state.cpacs.delete_aeromap(aeromap)
-                st.experimental_rerun()
+            st.button(
+                "❌",
+                key=f"del{i}",
+                help="Delete this aeromap",
+                on_click=delete_aeromap,
+                args=(aeromap,),
+            )
 
     st.markdown("#### Add a point")
 
@@ -143,13 +228,17 @@ def section_edit_aeromap():
     col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
 
     with col1:
-        alt = st.number_input("Alt", value=1000, min_value=0, step=100)
+        alt = st.number_input("Alt", value=1000, min_value=0, step=100, key="point_alt")
     with col2:
-        mach = st.number_input("Mach", value=0.3, min_value=0.0, step=0.1)
+        mach = st.number_input("Mach", value=0.3, min_value=0.0, step=0.1, key="point_mach")
     with col3:
-        aos = st.number_input("AoS", value=0.0, min_value=-90.0, max_value=90.0, step=0.1)
+        aos = st.number_input(
+            "AoS", value=0.0, min_value=-90.0, max_value=90.0, step=0.1, key="point_aos"
+        )
     with col4:
-        aoa = st.number_input("AoA", value=0.0, min_value=-90.0, max_value=90.0, step=0.1)
+        aoa = st.number_input(
+            "AoA", value=0.0, min_value=-90.0, max_value=90.0, step=0.1, key="point_aoa"
+        )
     with col5:
         st.session_state.point_exist = False
         st.markdown("")
@@ -178,40 +267,54 @@ def section_edit_aeromap():
 
     help_aeromap_uid = "The aeromap will contain 1 point corresponding to the value above, then \
                         you can add more point to it."
-    new_aeromap_uid = form.text_input(
+    form.text_input(
         "Aeromap uid",
         help=help_aeromap_uid,
+        key="new_aeromap_uid",
     )
     default_description = "Created with CEASIOMpy Graphical user interface"
-    new_aeromap_description = form.text_input(
-        "Aeromap description", value=default_description, help="optional"
+    form.text_input(
+        "Aeromap description",
+        value=default_description,
+        help="optional",
+        key="new_aeromap_description",
     )
 
-    if form.form_submit_button("Create new"):
-        if new_aeromap_uid not in aeromap_uid_list:
-            new_aeromap = st.session_state.cpacs.create_aeromap(new_aeromap_uid)
-            new_aeromap.description = new_aeromap_description
-            new_aeromap.add_row(mach=mach, alt=alt, aos=aos, aoa=aoa)
-            new_aeromap.save()
-            st.experimental_rerun()
-        else:
-            st.error("There is already an aeromap with this name!")
+    form.form_submit_button("Create new", on_click=create_new_aeromap)
+
+    if st.session_state.pop("new_aeromap_exist", False):
+        st.error("There is already an aeromap with this name!")
 
     st.markdown("#### Import aeromap from CSV")
 
     uploaded_csv = st.file_uploader("Choose a CSV file")
     if uploaded_csv:
-        uploaded_aeromap_uid = uploaded_csv.name.split(".csv")[0]
+        st.button("Add this aeromap", on_click=add_uploaded_aeromap, args=(uploaded_csv,))
+
+        if st.session_state.pop("uploaded_aeromap_exist", False):
+            st.error("There is already an aeromap with this name!")
 
-        if st.button("Add this aeromap"):
-            if uploaded_aeromap_uid in aeromap_uid_list:
-                st.error("There is already an aeromap with this name!")
-                return
 
-            new_aeromap = st.session_state.cpacs.create_aeromap(uploaded_aeromap_uid)
-            new_aeromap.df = pd.read_csv(uploaded_csv, keep_default_na=False)
-            new_aeromap.save()
-            st.experimental_rerun()
+def write_mesh_buffer(mesh_path, buffer):
+    """Write a (potentially very large) uploaded mesh buffer to disk in large chunks on a raw
+    file descriptor, hinting the kernel that the file is written sequentially."""
+
+    mesh_buffer = memoryview(buffer)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    fd = os.open(mesh_path, flags, 0o644)
+
+    try:
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:  # only a hint, some filesystems do not support it
+                pass
+
+        offset = 0
+        while offset < len(mesh_buffer):
+            offset += os.write(fd, mesh_buffer[offset : offset + MESH_WRITE_CHUNK_SIZE])
+    finally:
+        os.close(fd)
 
 
 def mesh_file_upload():
@@ -235,8 +338,7 @@ def mesh_file_upload():
 
         try:
             # Scrivi il file nel percorso specificato
-            with open(mesh_new_path, "wb") as f:
-                f.write(uploaded_mesh.getbuffer())
+            write_mesh_buffer(mesh_new_path, uploaded_mesh.getbuffer())
 
             # Apri il file CPACS
             cpacs_path = st.session_state.workflow.cpacs_in
@@ -285,6 +387,7 @@ def add_module_tab():
         st.session_state.tabs = st.tabs(st.session_state.workflow_modules)
 
     st.session_state.xpath_to_update = {}
+    reset_cpacs_cache()
 
     for m, (tab, module) in enumerate(
         zip(st.session_state.tabs, st.session_state.workflow_modules)
@@ -324,9 +427,7 @@ def add_module_tab():
                             st.error("You must create an aeromap in order to use this module!")
                             continue
 
-                        value = get_value_or_default(
-                            st.session_state.cpacs.tixi, xpath, aeromap_uid_list[0]
-                        )
+                        value = get_cached_value_or_default(xpath, aeromap_uid_list[0])
                         if value in aeromap_uid_list:
                             idx = aeromap_uid_list.index(value)
                         else:
@@ -376,11 +477,7 @@ def add_module_tab():
                         with st.columns([1, 2])[0]:
                             st.number_input(
                                 name,
-                                value=int(
-                                    get_value_or_default(
-                                        st.session_state.cpacs.tixi, xpath, default_value
-                                    )
-                                ),
+                                value=int(get_cached_value_or_default(xpath, default_value)),
                                 key=key,
                                 help=description,
                             )
@@ -389,18 +486,14 @@ def add_module_tab():
                         with st.columns([1, 2])[0]:
                             st.number_input(
                                 name,
-                                value=get_value_or_default(
-                                    st.session_state.cpacs.tixi, xpath, default_value
-                                ),
+                                value=get_cached_value_or_default(xpath, default_value),
                                 format="%g",
                                 key=key,
                                 help=description,
                             )
 
                     elif var_type == list:
-                        value = get_value_or_default(
-                            st.session_state.cpacs.tixi, xpath, default_value[0]
-                        )
+                        value = get_cached_value_or_default(xpath, default_value[0])
                         idx = default_value.index(value)
                         st.radio(
                             name,
@@ -413,9 +506,7 @@ def add_module_tab():
                     elif var_type == bool:
                         st.checkbox(
                             name,
-                            value=get_value_or_default(
-                                st.session_state.cpacs.tixi, xpath, default_value
-                            ),
+                            value=get_cached_value_or_default(xpath, default_value),
                             key=key,
                             help=description,
                         )
@@ -433,9 +524,7 @@ def add_module_tab():
                         with st.columns([1, 2])[0]:
                             st.text_input(
                                 name,
-                                value=get_value_or_default(
-                                    st.session_state.cpacs.tixi, xpath, default_value
-                                ),
+                                value=get_cached_value_or_default(xpath, default_value),
                                 key=key,
                                 help=description,
                             )